@@ -2,8 +2,26 @@ from __future__ import annotations
 
 import re
 import json
+import logging
+from collections import OrderedDict
+from hashlib import blake2b
 from dataclasses import dataclass
-from typing import Iterable, List, Sequence
+from typing import Any, Callable, Iterable, List, Sequence
+
+try:  # Python 3.11+
+    from re import _parser as _sre_parse
+except ImportError:  # pragma: no cover - 旧版本解释器
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+try:  # 可选引擎：regex（兼容 re 语法）
+    import regex as _regex_engine
+except ImportError:
+    _regex_engine = None
+
+try:  # 可选引擎：google-re2（线性时间，不支持反向引用与环视）
+    import re2 as _re2_engine
+except ImportError:
+    _re2_engine = None
 
 import astrbot.api.message_components as message_components
 from astrbot.api import AstrBotConfig, logger
@@ -13,6 +31,18 @@ from astrbot.api.star import Context, Star, register
 
 _SCOPE_OPTIONS = {"user_input", "ai_output", "both"}
 
+_ENGINE_OPTIONS = {"re", "regex", "re2"}
+
+# 历史上下文裁剪结果的缓存上限（按文本内容计）
+_CONTEXT_CACHE_LIMIT = 256
+
+# RE2 仅支持以内联形式表达的标志，其余标志需回退到标准库 re
+_RE2_INLINE_FLAGS = {
+    re.IGNORECASE: "i",
+    re.MULTILINE: "m",
+    re.DOTALL: "s",
+}
+
 _FLAG_SYMBOLS = {
     "ASCII": re.ASCII,
     "IGNORECASE": re.IGNORECASE,
@@ -23,6 +53,170 @@ _FLAG_SYMBOLS = {
     "UNICODE": re.UNICODE,
 }
 
+# 已输出过警告的未知 flag / scope / engine，避免同一配置错误反复刷屏
+_WARNED_FLAGS: set[str] = set()
+_WARNED_SCOPES: set[str] = set()
+_WARNED_ENGINES: set[str] = set()
+
+# 字符串形式的 flags 中除空白外允许的分隔符
+_FLAG_SEPARATOR_TABLE = str.maketrans({"|": " ", ",": " "})
+
+# 归一化后的标志组合缓存：frozenset(tokens) -> 排序后的元组
+_FLAG_TUPLE_CACHE: dict[frozenset[str], tuple[str, ...]] = {}
+
+
+def _build_replacer(
+    template: str, *, can_match_empty: bool, engine: str
+) -> str | Callable[[re.Match[str]], str]:
+    """为规则预先确定传给 subn 的替换参数，避免每次执行流水线时重新创建闭包。
+
+    pattern 不可能零长匹配时直接返回模板字符串，由引擎在 C 层处理（re 的模板已在编译期校验；
+    其余引擎仅限不含反斜杠的纯文本模板）；否则返回回调以跳过零长匹配。
+    模板不含反斜杠时回调直接返回常量，不再调用 expand。
+    """
+    if not can_match_empty and (
+        engine == "re" or (engine == "regex" and "\\" not in template)
+    ):
+        return template
+
+    if "\\" not in template:
+
+        def _constant_replacement(match: re.Match[str]) -> str:
+            # 避免零长匹配（例如 .* 在结尾）导致重复替换
+            if match.start() == match.end():
+                return ""
+            return template
+
+        return _constant_replacement
+
+    def _replacement(match: re.Match[str]) -> str:
+        # 避免零长匹配（例如 .* 在结尾）导致重复替换
+        if match.start() == match.end():
+            return match.group(0)
+        return match.expand(template)
+
+    return _replacement
+
+
+def _compile_with_engine(pattern_text: str, flags: int, engine: str) -> tuple[Any, str]:
+    """使用指定引擎编译正则，返回 (编译结果, 实际引擎)。
+
+    第三方引擎缺失或拒绝该 pattern 时回退到标准库 re，由 re 负责报告语法错误。
+    """
+    if engine == "re2" and _re2_engine is not None:
+        inline = ""
+        remaining = flags & ~re.UNICODE
+        for flag_value, letter in _RE2_INLINE_FLAGS.items():
+            if remaining & flag_value:
+                inline += letter
+                remaining &= ~flag_value
+        if not remaining:
+            try:
+                prefix = f"(?{inline})" if inline else ""
+                return _re2_engine.compile(prefix + pattern_text), "re2"
+            except Exception:
+                pass
+    elif engine == "regex" and _regex_engine is not None:
+        # regex 的标志位数值与 re 不完全一致（例如 re.ASCII 的值在 regex 中是 VERSION1），
+        # 需按名称逐个转换；VERSION0 保持与标准库 re 一致的语义
+        regex_flags = _regex_engine.VERSION0
+        for flag_name, flag_value in _FLAG_SYMBOLS.items():
+            if flags & flag_value:
+                regex_flags |= getattr(_regex_engine, flag_name)
+        try:
+            return _regex_engine.compile(pattern_text, regex_flags), "regex"
+        except Exception:
+            pass
+
+    return re.compile(pattern_text, flags), "re"
+
+
+def _validate_template(compiled: Any, template: str) -> None:
+    """在编译期校验 replacement 模板中的反向引用与转义，非法时抛出 re.error / IndexError。
+
+    re 直接用编译结果解析模板；regex / re2 的 Pattern 不会提前解析模板，
+    这里按其分组数与分组名构造一个等价的 re 替身 pattern 交给 re 校验。
+    """
+    if "\\" not in template:
+        return
+    if isinstance(compiled, re.Pattern):
+        compiled.sub(template, "")
+        return
+
+    names = {index: name for name, index in compiled.groupindex.items()}
+    try:
+        stand_in = re.compile(
+            "".join(
+                f"(?P<{names[index]}>)" if index in names else "()"
+                for index in range(1, compiled.groups + 1)
+            )
+        )
+    except re.error:
+        # 分组名不符合 re 的语法时无法构造替身，放弃校验
+        return
+    stand_in.sub(template, "")
+
+
+def _can_match_empty(pattern_text: str, flags: int) -> bool:
+    """判断 pattern 是否可能产生零长匹配；无法解析时保守地返回 True。"""
+    try:
+        return _sre_parse.parse(pattern_text, flags).getwidth()[0] == 0
+    except Exception:
+        return True
+
+
+def _extract_required_literal(pattern_text: str, flags: int) -> str | None:
+    """提取匹配成功时必然出现的最长字面量片段，无法确定时返回 None。
+
+    仅考虑顶层（及不带额外标志的分组内）连续的 LITERAL 节点；分支、重复、
+    字符集、断言等结构都会截断当前片段，以保证结果是保守的。
+    """
+    try:
+        parsed = _sre_parse.parse(pattern_text, flags)
+    except Exception:
+        return None
+
+    # 忽略大小写时无法用 `in` 做等价的预判
+    if (flags | parsed.state.flags) & re.IGNORECASE:
+        return None
+
+    best = ""
+    current: List[str] = []
+
+    def _walk(items) -> None:
+        nonlocal best
+        for op, av in items:
+            if op is _sre_parse.LITERAL:
+                current.append(chr(av))
+                continue
+            if op is _sre_parse.SUBPATTERN:
+                _group, add_flags, _del_flags, sub_pattern = av
+                if not add_flags & re.IGNORECASE:
+                    _walk(sub_pattern)
+                    continue
+            if len(current) > len(best):
+                best = "".join(current)
+            current.clear()
+
+    _walk(parsed)
+    if len(current) > len(best):
+        best = "".join(current)
+    return best or None
+
+
+def _extract_exact_literal(pattern_text: str, flags: int) -> str | None:
+    """若 pattern 只由字面量字符组成（且区分大小写），返回该字面量。"""
+    try:
+        parsed = _sre_parse.parse(pattern_text, flags)
+    except Exception:
+        return None
+
+    if (flags | parsed.state.flags) & re.IGNORECASE:
+        return None
+    if not len(parsed) or any(op is not _sre_parse.LITERAL for op, _av in parsed):
+        return None
+    return "".join(chr(av) for _op, av in parsed)
+
 
 @dataclass(slots=True)
 class RuntimeRegexRule:
@@ -31,16 +225,50 @@ class RuntimeRegexRule:
     identifier: str
     scope: str
     order: int
-    compiled: re.Pattern[str]
+    compiled: re.Pattern[str]  # 也可能是 regex / re2 的兼容 Pattern 对象
     replacement: str
     origin_index: int
-
-    def applies_to(self, target_scope: str) -> bool:
-        if target_scope == "user_input":
-            return self.scope in {"user_input", "both"}
-        if target_scope == "ai_output":
-            return self.scope in {"ai_output", "both"}
-        return False
+    replacer: str | Callable[[re.Match[str]], str]
+    required_literal: str | None = None
+    engine: str = "re"
+    # 纯字面量规则（pattern 与 replacement 均不含正则语义）可直接 str.replace
+    literal: str | None = None
+
+
+def _build_pipeline(rules: Sequence[RuntimeRegexRule]) -> Callable[[str], str]:
+    """为给定规则序列生成专用的流水线函数。
+
+    每条规则展开为一行直接调用，预判字面量、str.replace 与 Pattern.sub 的选择在此一次确定；
+    所需对象以关键字默认参数注入，运行时均为局部变量访问，省去逐条遍历规则的开销。
+    _run_pipeline 在 DEBUG 模式下的逐条循环是同一逻辑的另一份实现，两者须保持行为一致。
+    """
+    params: List[str] = []
+    body: List[str] = []
+    namespace: dict[str, object] = {}
+
+    for index, rule in enumerate(rules):
+        indent = "    "
+        if rule.required_literal is not None:
+            namespace[f"_q{index}"] = rule.required_literal
+            params.append(f"_q{index}=_q{index}")
+            body.append(f"    if _q{index} in text:")
+            indent = "        "
+
+        if rule.literal is not None:
+            namespace[f"_l{index}"] = rule.literal
+            namespace[f"_r{index}"] = rule.replacement
+            params.extend((f"_l{index}=_l{index}", f"_r{index}=_r{index}"))
+            body.append(f"{indent}text = text.replace(_l{index}, _r{index})")
+        else:
+            namespace[f"_s{index}"] = rule.compiled.sub
+            namespace[f"_r{index}"] = rule.replacer
+            params.extend((f"_s{index}=_s{index}", f"_r{index}=_r{index}"))
+            body.append(f"{indent}text = _s{index}(_r{index}, text)")
+
+    signature = "text, *, " + ", ".join(params) if params else "text"
+    source = "\n".join([f"def _pipeline({signature}):", *body, "    return text"])
+    exec(compile(source, "<regex_cutting_lab_pipeline>", "exec"), namespace)
+    return namespace["_pipeline"]  # type: ignore[return-value]
 
 
 @register(
@@ -57,9 +285,21 @@ class RegexCuttingLab(Star):
         super().__init__(context)
         self.config = config or AstrBotConfig()
         self._compiled_rules: tuple[RuntimeRegexRule, ...] = ()
-        self._signature: tuple[tuple, ...] = ()
-        self._has_user_scoped_rules = False
-        self._has_ai_scoped_rules = False
+        self._config_digest: bytes = b""
+        # 配置来源快照：(rules_json 对象, rules 对象, rules 长度, 引擎)，用于跳过未变化的配置
+        self._source_token: tuple[object, object, int, object] | None = None
+        # 按作用目标预先拆分的规则序列，执行流水线时无需逐条判断 scope
+        self._scope_rules: dict[str, tuple[RuntimeRegexRule, ...]] = {
+            "user_input": (),
+            "ai_output": (),
+        }
+        # 按作用目标生成的专用流水线函数，未开启 DEBUG 时直接调用
+        self._scope_pipelines: dict[str, Callable[[str], str]] = {
+            "user_input": _build_pipeline(()),
+            "ai_output": _build_pipeline(()),
+        }
+        # 历史用户消息的裁剪结果：原文 -> (裁剪后文本, 是否变化)；规则变化时整体清空
+        self._context_cache: OrderedDict[str, tuple[str, bool]] = OrderedDict()
 
     # 调试辅助：概览链中的 Plain 文本
     def _outline_chain(self, chain: list[message_components.BaseMessageComponent]) -> list[str]:
@@ -73,6 +313,9 @@ class RegexCuttingLab(Star):
 
     # 调试辅助：记录响应当前状态（避免误判来自插件的重复）
     def _log_resp_state(self, label: str, resp: LLMResponse) -> None:
+        # 未开启 DEBUG 时无需遍历消息链生成快照
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
         try:
             chain_outline = []
             if resp.result_chain and resp.result_chain.chain:
@@ -96,10 +339,31 @@ class RegexCuttingLab(Star):
 
     def _ensure_rules(self) -> None:
         """根据配置构建正则流水线，避免重复编译。"""
+        rules_json_text = self.config.get("rules_json") if self.config else None
+        # 缺省值用 None 而非 []，否则每次调用都会得到新的列表对象导致快照失效
+        legacy_rules = self.config.get("rules") if self.config else None
+        legacy_length = len(legacy_rules) if isinstance(legacy_rules, list) else -1
+        raw_engine = self.config.get("regex_engine") if self.config else None
+
+        # 配置对象未被替换且列表长度未变时直接复用现有流水线，
+        # 避免每次 LLM 事件都重新解析、归一化全部规则。
+        cached_token = self._source_token
+        if (
+            cached_token is not None
+            and cached_token[0] is rules_json_text
+            and cached_token[1] is legacy_rules
+            and cached_token[2] == legacy_length
+            and cached_token[3] == raw_engine
+        ):
+            return
+        # 持有原对象引用而非 id()，防止对象被回收后 id 被复用造成误判；
+        # 仅在重建成功完成后写入，重建中途抛错时下次事件仍会重试
+        source_token = (rules_json_text, legacy_rules, legacy_length, raw_engine)
+        engine = self._normalize_engine(raw_engine)
+
         raw_rules: list = []
         if self.config:
             # 优先使用 rules_json（JSON 文本），提供更友好的代码编辑器界面
-            rules_json_text = self.config.get("rules_json")
             if isinstance(rules_json_text, str) and rules_json_text.strip():
                 try:
                     parsed = json.loads(rules_json_text)
@@ -112,9 +376,10 @@ class RegexCuttingLab(Star):
 
             # 兼容旧版 list<object> 规则字段
             if not raw_rules:
-                legacy_rules = self.config.get("rules", [])
                 if isinstance(legacy_rules, list):
                     raw_rules = legacy_rules
+                elif legacy_rules is None:
+                    raw_rules = []
                 else:
                     logger.warning(
                         "RegexCuttingLab: `rules` 字段应为列表，实际类型为 %s，已忽略。",
@@ -122,7 +387,10 @@ class RegexCuttingLab(Star):
                     )
                     raw_rules = []
 
-        signature: List[tuple] = []
+        # 以滚动摘要代替逐条签名元组，比较时只需对比 8 字节
+        digest = blake2b(digest_size=8)
+        digest.update(engine.encode("utf-8"))
+        digest.update(b"\x01")
         candidates: List[RuntimeRegexRule] = []
 
         for index, item in enumerate(raw_rules):
@@ -139,19 +407,22 @@ class RegexCuttingLab(Star):
             replacement_text = "" if replacement_raw is None else str(replacement_raw)
             order_value = self._safe_int(item.get("order"), (index + 1) * 100)
             flag_tokens = self._normalize_flags(item.get("flags", []))
-            enabled = bool(item.get("enabled", True))
-
-            signature.append(
-                (
-                    name,
-                    scope,
-                    str(pattern_text),
-                    replacement_text,
-                    tuple(flag_tokens),
-                    enabled,
-                    order_value,
-                )
-            )
+            enabled = item.get("enabled", True)
+
+            for field in (
+                name,
+                scope,
+                str(pattern_text),
+                replacement_text,
+                "1" if enabled else "0",
+                str(order_value),
+                # flags 逐个写入并以计数开头，避免 "A|B" 与 ["A", "B"] 得到相同摘要
+                str(len(flag_tokens)),
+                *flag_tokens,
+            ):
+                digest.update(field.encode("utf-8", "surrogatepass"))
+                digest.update(b"\x00")
+            digest.update(b"\x01")
 
             if not enabled:
                 continue
@@ -162,11 +433,13 @@ class RegexCuttingLab(Star):
                 )
                 continue
 
+            flag_value = self._flags_to_value(flag_tokens)
             try:
-                compiled_pattern = re.compile(
-                    str(pattern_text), self._flags_to_value(flag_tokens)
+                compiled_pattern, used_engine = _compile_with_engine(
+                    str(pattern_text), flag_value, engine
                 )
-            except re.error as exc:
+            except (re.error, ValueError) as exc:
+                # ValueError：例如 LOCALE 标志不能用于 str pattern
                 logger.error(
                     "RegexCuttingLab: 正则规则 %s 编译失败（pattern=%r）：%s",
                     name,
@@ -175,6 +448,42 @@ class RegexCuttingLab(Star):
                 )
                 continue
 
+            # 非法模板在 re 中每次 sub 都会抛错，在 regex / re2 中则会在每次命中时抛错，
+            # 需在编译期排除，避免中断整条流水线
+            try:
+                _validate_template(compiled_pattern, replacement_text)
+            except (re.error, IndexError) as exc:
+                # IndexError：re 对未知的具名分组（\g<name>）抛出的是 IndexError
+                logger.error(
+                    "RegexCuttingLab: 正则规则 %s 的 replacement 无效（replacement=%r）：%s",
+                    name,
+                    replacement_text,
+                    exc,
+                )
+                continue
+
+            if used_engine != engine:
+                logger.warning(
+                    "RegexCuttingLab: 规则 %s 无法使用 %s 引擎（未安装或 pattern 不受支持），已回退为 re。",
+                    name,
+                    engine,
+                )
+
+            # 以下分析基于标准库的 sre_parse，只对 re 引擎成立；
+            # regex / re2 有各自的语法（如模糊匹配 {e<=1}），一律按保守值处理
+            if used_engine == "re":
+                can_match_empty = _can_match_empty(str(pattern_text), flag_value)
+                required_literal = _extract_required_literal(str(pattern_text), flag_value)
+                literal = (
+                    None
+                    if "\\" in replacement_text
+                    else _extract_exact_literal(str(pattern_text), flag_value)
+                )
+            else:
+                can_match_empty = True
+                required_literal = None
+                literal = None
+
             candidates.append(
                 RuntimeRegexRule(
                     identifier=name,
@@ -183,28 +492,48 @@ class RegexCuttingLab(Star):
                     compiled=compiled_pattern,
                     replacement=replacement_text,
                     origin_index=index,
+                    replacer=_build_replacer(
+                        replacement_text,
+                        can_match_empty=can_match_empty,
+                        engine=used_engine,
+                    ),
+                    required_literal=required_literal,
+                    engine=used_engine,
+                    literal=literal,
                 )
             )
 
-        signature_tuple = tuple(signature)
-        if signature_tuple == self._signature:
+        config_digest = digest.digest()
+        if config_digest == self._config_digest:
+            self._source_token = source_token
             return
 
         candidates.sort(key=lambda rule: (rule.order, rule.origin_index))
         self._compiled_rules = tuple(candidates)
-        self._signature = signature_tuple
-        self._has_user_scoped_rules = any(
-            rule.applies_to("user_input") for rule in self._compiled_rules
-        )
-        self._has_ai_scoped_rules = any(
-            rule.applies_to("ai_output") for rule in self._compiled_rules
-        )
+        self._config_digest = config_digest
+        self._context_cache.clear()
+        self._scope_rules = {
+            "user_input": tuple(
+                rule
+                for rule in self._compiled_rules
+                if rule.scope in ("user_input", "both")
+            ),
+            "ai_output": tuple(
+                rule
+                for rule in self._compiled_rules
+                if rule.scope in ("ai_output", "both")
+            ),
+        }
+        self._scope_pipelines = {
+            scope: _build_pipeline(rules) for scope, rules in self._scope_rules.items()
+        }
+        self._source_token = source_token
 
         logger.info(
             "RegexCuttingLab: 已载入 %d 条规则（用户输入：%s / 模型输出：%s）。",
             len(self._compiled_rules),
-            "是" if self._has_user_scoped_rules else "否",
-            "是" if self._has_ai_scoped_rules else "否",
+            "是" if self._scope_rules["user_input"] else "否",
+            "是" if self._scope_rules["ai_output"] else "否",
         )
 
     @filter.on_llm_request()
@@ -216,23 +545,23 @@ class RegexCuttingLab(Star):
             return
 
         self._ensure_rules()
-        if not self._has_user_scoped_rules:
+        if not self._scope_rules["user_input"]:
             return
 
         updated = False
 
         if isinstance(request.prompt, str) and request.prompt:
-            transformed_prompt = self._run_pipeline(
+            transformed_prompt, changed = self._run_pipeline(
                 request.prompt, target_scope="user_input"
             )
-            if transformed_prompt != request.prompt:
+            if changed:
                 request.prompt = transformed_prompt
                 updated = True
 
         if self._apply_to_context_messages(request.contexts):
             updated = True
 
-        if updated:
+        if updated and logger.isEnabledFor(logging.DEBUG):
             logger.debug(
                 "RegexCuttingLab: 会话 %s 的用户输入已按规则裁剪。",
                 event.unified_msg_origin,
@@ -259,7 +588,7 @@ class RegexCuttingLab(Star):
         setattr(response, "_regex_cutting_lab_applied", True)
 
         self._ensure_rules()
-        if not self._has_ai_scoped_rules:
+        if not self._scope_rules["ai_output"]:
             return
 
         chain_changed = self._apply_to_result_chain(response)
@@ -268,7 +597,7 @@ class RegexCuttingLab(Star):
         # 处理后快照
         self._log_resp_state("after", response)
 
-        if chain_changed or text_changed:
+        if (chain_changed or text_changed) and logger.isEnabledFor(logging.DEBUG):
             logger.debug(
                 "RegexCuttingLab: 会话 %s 的模型输出已按规则裁剪。",
                 event.unified_msg_origin,
@@ -278,43 +607,66 @@ class RegexCuttingLab(Star):
         """对消息链中的纯文本组件应用正则流水线。
         
         为避免出现 '123123'、'11' 等重复问题，这里将相邻的 Plain 文本段
-        先合并为一个整体文本再进行一次性替换，最后再写回为单个 Plain。
-        非文本组件的顺序与内容保持不变。
+        先合并为一个整体文本再进行一次性替换，仅在文本发生变化时写回为单个 Plain；
+        单个 Plain 直接原地改写，未变化的链保持原样。非文本组件的顺序与内容保持不变。
         """
         chain = response.result_chain
         if not chain:
             return False
 
         mutated = False
+        merged = False
         new_components: List[message_components.BaseMessageComponent] = []
-        text_buffer: List[str] = []
-
-        def flush_buffer():
-            nonlocal mutated  # 确保变更标记写回外层作用域
-            if text_buffer:
-                original_text = "".join(text_buffer)
-                transformed_text = self._run_pipeline(
+        plain_run: List[message_components.Plain] = []
+
+        def flush_run():
+            nonlocal mutated, merged  # 确保变更标记写回外层作用域
+            if not plain_run:
+                return
+            if len(plain_run) == 1:
+                # 单个 Plain 直接原地改写文本，无需重建组件
+                component = plain_run[0]
+                original_text = component.text
+                if not original_text:
+                    # 空文本无需经过任何规则
+                    new_components.append(component)
+                    plain_run.clear()
+                    return
+                transformed_text, changed = self._run_pipeline(
                     original_text, target_scope="ai_output"
                 )
-                if transformed_text != original_text:
+                if changed:
+                    component.text = transformed_text
                     mutated = True
-                new_components.append(message_components.Plain(transformed_text))
-                text_buffer.clear()
+                new_components.append(component)
+            else:
+                original_text = "".join(comp.text or "" for comp in plain_run)
+                transformed_text, changed = self._run_pipeline(
+                    original_text, target_scope="ai_output"
+                )
+                if changed:
+                    mutated = merged = True
+                    new_components.append(message_components.Plain(transformed_text))
+                else:
+                    # 未发生变化时保留原组件，不做合并
+                    new_components.extend(plain_run)
+            plain_run.clear()
 
         for component in chain.chain:
             if isinstance(component, message_components.Plain):
                 # 收集连续的纯文本段
-                text_buffer.append(component.text or "")
+                plain_run.append(component)
             else:
-                # 遇到非文本组件，先输出合并后的文本，再输出该组件
-                flush_buffer()
+                # 遇到非文本组件，先处理合并后的文本，再输出该组件
+                flush_run()
                 new_components.append(component)
 
-        # 处理末尾残留的文本缓冲
-        flush_buffer()
+        # 处理末尾残留的文本段
+        flush_run()
 
-        if mutated:
+        if merged:
             chain.chain = new_components
+        if mutated:
             # 不再触碰 completion_text，避免在部分管线中“消息链 + completion_text”被同时发送造成重复
             logger.debug("RegexCuttingLab: result_chain mutated; completion_text untouched.")
 
@@ -323,8 +675,12 @@ class RegexCuttingLab(Star):
     def _apply_to_completion_text(self, response: LLMResponse) -> bool:
         """当消息链不存在时，回退裁剪 completion_text。"""
         original_text = response.completion_text
-        transformed_text = self._run_pipeline(original_text, target_scope="ai_output")
-        if transformed_text == original_text:
+        if not original_text:
+            return False
+        transformed_text, changed = self._run_pipeline(
+            original_text, target_scope="ai_output"
+        )
+        if not changed:
             return False
 
         response.completion_text = transformed_text
@@ -344,8 +700,8 @@ class RegexCuttingLab(Star):
 
             content = message.get("content")
             if isinstance(content, str):
-                transformed = self._run_pipeline(content, target_scope="user_input")
-                if transformed != content:
+                transformed, changed = self._transform_context_text(content)
+                if changed:
                     message["content"] = transformed
                     mutated = True
             elif isinstance(content, list):
@@ -355,35 +711,75 @@ class RegexCuttingLab(Star):
                     if segment.get("type") != "text":
                         continue
                     text_value = segment.get("text", "")
-                    transformed_segment = self._run_pipeline(
-                        text_value, target_scope="user_input"
+                    transformed_segment, changed = self._transform_context_text(
+                        text_value
                     )
-                    if transformed_segment != text_value:
+                    if changed:
                         segment["text"] = transformed_segment
                         mutated = True
 
         return mutated
 
-    def _run_pipeline(self, text: str, *, target_scope: str) -> str:
-        """按顺序应用匹配 target_scope 的规则。"""
+    def _transform_context_text(self, text: str) -> tuple[str, bool]:
+        """裁剪历史上下文文本，按内容复用此前的结果。
+
+        AstrBot 每轮都会重新构造 contexts，消息对象的 id 无法跨轮复用，
+        因此以文本内容作为键；同一段历史在规则不变时只需计算一次。
+        DEBUG 模式下绕过缓存，保证每条规则的改动日志完整输出。
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            return self._run_pipeline(text, target_scope="user_input")
+
+        cache = self._context_cache
+        cached = cache.get(text)
+        if cached is not None:
+            cache.move_to_end(text)
+            return cached
+
+        outcome = self._run_pipeline(text, target_scope="user_input")
+        cache[text] = outcome
+        if len(cache) > _CONTEXT_CACHE_LIMIT:
+            cache.popitem(last=False)
+        return outcome
+
+    def _run_pipeline(self, text: str, *, target_scope: str) -> tuple[str, bool]:
+        """按顺序应用匹配 target_scope 的规则，返回 (结果文本, 是否发生变化)。
+
+        没有任何规则命中时，str.replace / sub 都会原样返回输入对象，
+        因此可以先用 `is` 判断，只有对象不同才需要比较内容。
+        """
+        # 规则不会在空文本上产生输出（零长匹配已被忽略），直接返回
+        if not text:
+            return text, False
+        if not logger.isEnabledFor(logging.DEBUG):
+            pipeline = self._scope_pipelines.get(target_scope)
+            if pipeline is None:
+                return text, False
+            result = pipeline(text)
+            return result, result is not text and result != text
+
+        # DEBUG 模式下逐条执行，以便记录每条规则的改动。
+        # 注意：这是流水线的第二份实现，行为须与 _build_pipeline 生成的函数保持完全一致
+        # （字面量预判、str.replace 快速路径、替换参数），修改任一处时需同步另一处。
         result = text
-        for rule in self._compiled_rules:
-            if not rule.applies_to(target_scope):
+        for rule in self._scope_rules.get(target_scope, ()):
+            # 必需的字面量不存在时该规则不可能匹配，跳过整段正则扫描
+            if rule.required_literal is not None and rule.required_literal not in result:
                 continue
 
             before = result
-
-            def _replacement(match: re.Match[str]) -> str:
-                # 避免零长匹配（例如 .* 在结尾）导致重复替换
-                if match.start() == match.end():
-                    return match.group(0)
-                return match.expand(rule.replacement)
-
+            count = 0
             try:
-                result = rule.compiled.sub(_replacement, result)
+                if rule.literal is not None:
+                    # 纯字面量规则绕开正则引擎；前面的字面量预判已保证至少出现一次
+                    result = result.replace(rule.literal, rule.replacement)
+                    count = 1
+                else:
+                    # subn 的计数为 0 时文本必然未变，可省去一次整串比较
+                    result, count = rule.compiled.subn(rule.replacer, result)
             finally:
                 try:
-                    if before != result:
+                    if count and before != result:
                         logger.debug(
                             "RegexCuttingLab: rule[%s#%d scope=%s] changed text: before=%r -> after=%r",
                             rule.identifier,
@@ -402,7 +798,7 @@ class RegexCuttingLab(Star):
                 except Exception:
                     pass
 
-        return result
+        return result, result is not text and result != text
 
     @staticmethod
     def _normalize_scope(raw_scope: object) -> str:
@@ -411,31 +807,54 @@ class RegexCuttingLab(Star):
             if normalized in _SCOPE_OPTIONS:
                 return normalized
         if raw_scope is not None:
-            logger.warning(
-                "RegexCuttingLab: 未识别的 scope=%r，已自动回退为 ai_output。",
-                raw_scope,
-            )
+            warned_key = repr(raw_scope)
+            if warned_key not in _WARNED_SCOPES:
+                _WARNED_SCOPES.add(warned_key)
+                logger.warning(
+                    "RegexCuttingLab: 未识别的 scope=%r，已自动回退为 ai_output。",
+                    raw_scope,
+                )
         return "ai_output"
 
     @staticmethod
-    def _normalize_flags(raw_flags: object) -> List[str]:
+    def _normalize_engine(raw_engine: object) -> str:
+        if isinstance(raw_engine, str):
+            normalized = raw_engine.strip().lower()
+            if normalized in _ENGINE_OPTIONS:
+                return normalized
+        if raw_engine is not None:
+            warned_key = repr(raw_engine)
+            if warned_key not in _WARNED_ENGINES:
+                _WARNED_ENGINES.add(warned_key)
+                logger.warning(
+                    "RegexCuttingLab: 未识别的 regex_engine=%r，已自动回退为 re。",
+                    raw_engine,
+                )
+        return "re"
+
+    @staticmethod
+    def _normalize_flags(raw_flags: object) -> tuple[str, ...]:
         if isinstance(raw_flags, str):
+            # 分隔符统一转成空格后交给 str.split()，等价于按 [|,\s]+ 切分
             tokens = [
-                token.strip().upper()
-                for token in re.split(r"[|,\s]+", raw_flags)
-                if token.strip()
+                token.upper()
+                for token in raw_flags.translate(_FLAG_SEPARATOR_TABLE).split()
             ]
-            return tokens
-
-        if isinstance(raw_flags, Iterable):
-            tokens: List[str] = []
+        elif isinstance(raw_flags, Iterable):
+            tokens = []
             for token in raw_flags:  # type: ignore[assignment]
                 normalized = str(token).strip().upper()
                 if normalized:
                     tokens.append(normalized)
-            return tokens
+        else:
+            return ()
 
-        return []
+        # 标志顺序无关紧要，相同组合共享同一个排序后的元组
+        key = frozenset(tokens)
+        cached = _FLAG_TUPLE_CACHE.get(key)
+        if cached is None:
+            cached = _FLAG_TUPLE_CACHE.setdefault(key, tuple(sorted(key)))
+        return cached
 
     @staticmethod
     def _flags_to_value(tokens: Sequence[str]) -> int:
@@ -443,9 +862,11 @@ class RegexCuttingLab(Star):
         for token in tokens:
             flag_value = _FLAG_SYMBOLS.get(token)
             if flag_value is None:
-                logger.warning(
-                    "RegexCuttingLab: 未识别的正则标志 `%s`，已忽略。", token
-                )
+                if token not in _WARNED_FLAGS:
+                    _WARNED_FLAGS.add(token)
+                    logger.warning(
+                        "RegexCuttingLab: 未识别的正则标志 `%s`，已忽略。", token
+                    )
                 continue
             value |= flag_value
         return value
@@ -0,0 +1,221 @@
+import json
+import logging
+import re
+
+import pytest
+
+pytest.importorskip("astrbot")
+
+from astrbot.api import AstrBotConfig, logger  # noqa: E402
+
+import main  # noqa: E402
+from main import RegexCuttingLab  # noqa: E402
+
+
+def _make_plugin(rules: list[dict], **config) -> RegexCuttingLab:
+    plugin = RegexCuttingLab(
+        None, AstrBotConfig(enabled=True, rules_json=json.dumps(rules), **config)
+    )
+    plugin._ensure_rules()
+    return plugin
+
+
+@pytest.mark.parametrize("engine", ["re", "regex", "re2"])
+@pytest.mark.parametrize("bad_replacement", ["\\1", "\\5", "\\q", "\\g<missing>"])
+def test_invalid_replacement_template_skips_only_its_rule(engine, bad_replacement):
+    if engine != "re":
+        pytest.importorskip(engine)
+    plugin = _make_plugin(
+        [
+            {"pattern": "\\d+", "replacement": bad_replacement, "scope": "both"},
+            {"pattern": "ab", "replacement": "X", "scope": "both"},
+        ],
+        regex_engine=engine,
+    )
+
+    assert [rule.identifier for rule in plugin._compiled_rules] == ["Rule 2"]
+    for scope in ("user_input", "ai_output"):
+        assert plugin._run_pipeline("hello ab 42", target_scope=scope) == (
+            "hello X 42",
+            True,
+        )
+
+
+def test_invalid_flag_combination_skips_only_its_rule():
+    plugin = _make_plugin(
+        [
+            {"pattern": "a", "replacement": "b", "flags": ["LOCALE"]},
+            {"pattern": "ab", "replacement": "X"},
+        ]
+    )
+
+    assert [rule.identifier for rule in plugin._compiled_rules] == ["Rule 2"]
+    assert plugin._run_pipeline("hello ab", target_scope="ai_output") == (
+        "hello X",
+        True,
+    )
+
+
+def test_context_cache_is_bypassed_in_debug_mode(caplog):
+    plugin = _make_plugin([{"pattern": "ab", "replacement": "X", "scope": "both"}])
+    contexts = [{"role": "user", "content": "ab"}]
+
+    plugin._apply_to_context_messages([dict(message) for message in contexts])
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        plugin._apply_to_context_messages([dict(message) for message in contexts])
+
+    assert any("changed text" in record.getMessage() for record in caplog.records)
+
+
+@pytest.mark.parametrize("pattern", ["colour{e<=1}", "(?:colour){e<=1}"])
+def test_regex_engine_syntax_is_not_treated_as_literal(pattern):
+    regex = pytest.importorskip("regex")
+    plugin = _make_plugin(
+        [{"pattern": pattern, "replacement": "X"}], regex_engine="regex"
+    )
+
+    (rule,) = plugin._compiled_rules
+    assert rule.engine == "regex"
+    assert rule.literal is None and rule.required_literal is None
+    for text in ("color", "colour", "colr"):
+        expected = regex.sub(pattern, "X", text)
+        assert plugin._run_pipeline(text, target_scope="ai_output") == (
+            expected,
+            expected != text,
+        )
+
+
+def test_regex_engine_translates_flags_by_name():
+    regex = pytest.importorskip("regex")
+    plugin = _make_plugin(
+        [{"pattern": "\\w+", "replacement": "X", "flags": ["ASCII", "IGNORECASE"]}],
+        regex_engine="regex",
+    )
+
+    (rule,) = plugin._compiled_rules
+    assert rule.engine == "regex"
+    assert rule.compiled.flags & regex.ASCII and rule.compiled.flags & regex.IGNORECASE
+    assert not rule.compiled.flags & regex.VERSION1
+    assert plugin._run_pipeline("café", target_scope="ai_output") == ("Xé", True)
+
+
+@pytest.mark.parametrize(
+    ("engine", "module_attr"), [("regex", "_regex_engine"), ("re2", "_re2_engine")]
+)
+def test_missing_engine_falls_back_to_re(monkeypatch, engine, module_attr):
+    monkeypatch.setattr(main, module_attr, None)
+    plugin = _make_plugin([{"pattern": "a+", "replacement": "X"}], regex_engine=engine)
+
+    (rule,) = plugin._compiled_rules
+    assert rule.engine == "re"
+    assert plugin._run_pipeline("baaa", target_scope="ai_output") == ("bX", True)
+
+
+def test_re2_engine_applies_flags_inline():
+    pytest.importorskip("re2")
+    plugin = _make_plugin(
+        [{"pattern": "^a.b$", "replacement": "X", "flags": ["IGNORECASE", "DOTALL", "MULTILINE"]}],
+        regex_engine="re2",
+    )
+
+    (rule,) = plugin._compiled_rules
+    assert rule.engine == "re2"
+    assert plugin._run_pipeline("A\nB\nzz", target_scope="ai_output") == ("X\nzz", True)
+
+
+@pytest.mark.parametrize(
+    ("pattern", "flags"), [("(a)\\1", []), ("a (?=b)", ["VERBOSE"])]
+)
+def test_re2_engine_falls_back_for_unsupported_patterns(pattern, flags):
+    pytest.importorskip("re2")
+    plugin = _make_plugin(
+        [{"pattern": pattern, "replacement": "X", "flags": flags}], regex_engine="re2"
+    )
+
+    (rule,) = plugin._compiled_rules
+    assert rule.engine == "re"
+    assert plugin._run_pipeline("aab", target_scope="ai_output") == (
+        re.sub(pattern, "X", "aab", flags=re.VERBOSE if flags else 0),
+        True,
+    )
+
+
+def test_flag_token_boundaries_are_part_of_the_config_digest():
+    rule = {"pattern": "a.b", "replacement": "X", "flags": ["DOTALL|IGNORECASE"]}
+    plugin = RegexCuttingLab(None, AstrBotConfig(enabled=True, rules=[rule]))
+    plugin._ensure_rules()
+    assert plugin._run_pipeline("A\nb", target_scope="ai_output") == ("A\nb", False)
+
+    plugin.config["rules"] = [dict(rule, flags=["DOTALL", "IGNORECASE"])]
+    plugin._ensure_rules()
+    assert plugin._run_pipeline("A\nb", target_scope="ai_output") == ("X", True)
+
+
+def _reference_pipeline(rules: list[dict], text: str) -> str:
+    """逐条 compiled.sub 的朴素实现，作为优化后流水线的对照。"""
+    for rule in rules:
+        flags = 0
+        for token in rule.get("flags", []):
+            flags |= getattr(re, token)
+        compiled = re.compile(rule["pattern"], flags)
+
+        def _replacement(match, template=rule["replacement"]):
+            if match.start() == match.end():
+                return match.group(0)
+            return match.expand(template)
+
+        text = compiled.sub(_replacement, text)
+    return text
+
+
+_PIPELINE_CASES = [
+    ([{"pattern": "foo", "replacement": "bar"}], ["foo foo", "fo", "FOO", ""]),
+    ([{"pattern": "ab(cd)e", "replacement": "[\\1]"}], ["xabcdey", "abce", "abcd"]),
+    ([{"pattern": "(?i:ab)cd", "replacement": "X"}], ["ABcd", "abCD", "aBcd-AbCd"]),
+    ([{"pattern": "abc", "replacement": "X", "flags": ["IGNORECASE"]}], ["ABC aBc", "ab"]),
+    ([{"pattern": "(?i)abc", "replacement": "X"}], ["ABC", "xyz"]),
+    ([{"pattern": "x+yz", "replacement": "_"}], ["xxyz", "yz", "xy z"]),
+    ([{"pattern": "ab*c", "replacement": "_"}], ["ac abbbc", "ab"]),
+    ([{"pattern": "(?:ab)?cd", "replacement": "_"}], ["cd abcd", "ab"]),
+    ([{"pattern": "cat|dog", "replacement": "pet"}], ["cat dog", "cow"]),
+    ([{"pattern": "a(b|c)d", "replacement": "\\1"}], ["abd acd ad", "bd"]),
+    ([{"pattern": "a b  c # comment", "replacement": "X", "flags": ["VERBOSE"]}], ["abc", "a b c"]),
+    ([{"pattern": "foo(?=bar)", "replacement": "X"}], ["foobar foobaz", "bar"]),
+    ([{"pattern": "(?<!x)foo", "replacement": "X"}], ["xfoo foo", "fo"]),
+    ([{"pattern": "(?<=a)b", "replacement": "X"}], ["ab cb", "b"]),
+    ([{"pattern": ".*", "replacement": "123", "flags": ["DOTALL"]}], ["hello\nworld", "x"]),
+    ([{"pattern": "^", "replacement": ">", "flags": ["MULTILINE"]}], ["a\nb"]),
+    ([{"pattern": "\\bword\\b", "replacement": "W"}], ["word sword words", "wor"]),
+    ([{"pattern": "a\\.b", "replacement": "\\\\"}], ["a.b axb"]),
+    ([{"pattern": "(?P<user>\\w+)@(?P<host>\\w+)", "replacement": "\\g<host>:\\g<user>"}], ["me@box", "@"]),
+    (
+        [
+            {"pattern": ".*", "replacement": "123", "flags": ["DOTALL"], "order": 10},
+            {"pattern": "123", "replacement": "1", "order": 20},
+        ],
+        ["anything", ""],
+    ),
+    (
+        [
+            {"pattern": "a", "replacement": "bb", "order": 1},
+            {"pattern": "b+", "replacement": "c", "order": 2},
+            {"pattern": "cc", "replacement": "d", "order": 3},
+        ],
+        ["aa", "ab", "zzz"],
+    ),
+]
+
+
+@pytest.mark.parametrize("debug", [False, True])
+@pytest.mark.parametrize(("rules", "texts"), _PIPELINE_CASES)
+def test_pipeline_matches_plain_sub_loop(caplog, debug, rules, texts):
+    caplog.set_level(logging.DEBUG if debug else logging.INFO, logger=logger.name)
+    plugin = _make_plugin(rules)
+    assert len(plugin._compiled_rules) == len(rules)
+
+    for text in texts:
+        expected = _reference_pipeline(rules, text)
+        assert plugin._run_pipeline(text, target_scope="ai_output") == (
+            expected,
+            expected != text,
+        )